@@ -7,36 +7,90 @@ This module provides reference implementations for CPMM calculations to validate
 import math
 from decimal import Decimal, getcontext
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batch calls fall back to a scalar loop
+    np = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; the int64 fast paths are skipped
+    njit = None
+
 # Set precision for decimal calculations
 getcontext().prec = 50
 
+
+def _amount_out_formula(amount_in, reserve_in, reserve_out, fee_complement, max_fee_bps):
+    """Uniswap V2 closed form on plain ints (Numba-compilable)"""
+    in_fee = amount_in * fee_complement
+    return (reserve_out * in_fee) // (reserve_in * max_fee_bps + in_fee)
+
+
+# Compiled variant is only valid while every intermediate fits in int64;
+# callers guard on operand bit lengths before dispatching to it
+_amount_out_njit = njit(cache=True)(_amount_out_formula) if njit is not None else None
+
+if njit is not None:
+    # Random-input sweeps are embarrassingly parallel: each swap is
+    # independent, so prange fans the batch out across cores
+    @njit(parallel=True, cache=True)
+    def _batch_amount_out_njit(amounts, reserve_in, reserve_out, fee_complement, max_fee_bps, out):
+        for i in prange(amounts.shape[0]):
+            in_fee = amounts[i] * fee_complement
+            out[i] = (reserve_out * in_fee) // (reserve_in * max_fee_bps + in_fee)
+else:
+    _batch_amount_out_njit = None
+
 class CPMMReferenceModel:
     """Reference model for Constant Product Market Maker calculations"""
-    
+
+    max_fee_basis_points = 10000  # 100%
+    MIN_LIQUIDITY = 1000
+
     def __init__(self, reserve_a=0, reserve_b=0, fee_basis_points=30):
         """
         Initialize CPMM reference model
-        
+
         Args:
             reserve_a: Reserve of token A
             reserve_b: Reserve of token B
             fee_basis_points: Fee in basis points (30 = 0.3%)
         """
-        self.reserve_a = Decimal(str(reserve_a))
-        self.reserve_b = Decimal(str(reserve_b))
-        self.fee_basis_points = Decimal(str(fee_basis_points))
-        self.max_fee_basis_points = Decimal('10000')  # 100%
-        self.k_last = self.reserve_a * self.reserve_b  # Initial k value
-    
+        self.reserve_a = int(reserve_a)
+        self.reserve_b = int(reserve_b)
+        self.fee_basis_points = int(fee_basis_points)
+        self._fee_complement = self.max_fee_basis_points - self.fee_basis_points
+        self.k_last = self.reserve_a * self.reserve_b if self.reserve_a > 0 and self.reserve_b > 0 else 0
+        self._k_dirty = False
+        self.total_supply = 0
+
+        # Pool fees are fixed for the pool's lifetime, so partial-evaluate
+        # them into a generated function: the hot formula then carries the
+        # complement and scale as bytecode constants instead of attribute
+        # loads plus a subtraction per call
+        src = (
+            "def _go(amount_in, reserve_in, reserve_out):\n"
+            f"    in_fee = amount_in * {self._fee_complement}\n"
+            f"    return (reserve_out * in_fee) // (reserve_in * {self.max_fee_basis_points} + in_fee)\n"
+        )
+        ns = {}
+        exec(src, ns)
+        self._get_amount_out_fast = ns['_go']
+
+
     def get_amount_out(self, amount_in, reserve_in=None, reserve_out=None):
         """
         Calculate amount out for a swap using constant product formula
-        
+
+        Uses pure integer math (Uniswap V2 closed form) to match the
+        256-bit integer semantics of the Solidity contract exactly.
+
         Args:
             amount_in: Amount of input token
             reserve_in: Reserve of input token (optional, uses instance values if not provided)
             reserve_out: Reserve of output token (optional, uses instance values if not provided)
-            
+
         Returns:
             amount_out: Amount of output token
         """
@@ -44,35 +98,44 @@ class CPMMReferenceModel:
             reserve_in = self.reserve_a
         if reserve_out is None:
             reserve_out = self.reserve_b
-            
-        amount_in = Decimal(str(amount_in))
-        reserve_in = Decimal(str(reserve_in))
-        reserve_out = Decimal(str(reserve_out))
-        
-        # Calculate fee
-        fee = (amount_in * self.fee_basis_points) / self.max_fee_basis_points
-        amount_in_with_fee = amount_in - fee
-        
-        # Constant product formula: (x * y) = k
-        # amount_out = (reserve_out * amount_in_with_fee) / (reserve_in + amount_in_with_fee)
-        numerator = reserve_out * amount_in_with_fee
-        denominator = reserve_in + amount_in_with_fee
-        
-        if denominator == 0:
-            return Decimal('0')
-            
-        amount_out = numerator / denominator
-        return amount_out
-    
+
+        # Fuzz drivers pass ints already; only coerce stray Decimals/floats
+        if type(amount_in) is not int:
+            amount_in = int(amount_in)
+        if type(reserve_in) is not int:
+            reserve_in = int(reserve_in)
+        if type(reserve_out) is not int:
+            reserve_out = int(reserve_out)
+
+        # Dispatch to the Numba-compiled kernel when every intermediate
+        # product provably fits in int64 (fee factors use 14 bits)
+        if (_amount_out_njit is not None
+                and amount_in > 0 and reserve_in > 0
+                and amount_in.bit_length() + reserve_out.bit_length() < 49
+                and amount_in.bit_length() + reserve_in.bit_length() < 49):
+            return int(_amount_out_njit(
+                amount_in, reserve_in, reserve_out,
+                self._fee_complement, self.max_fee_basis_points
+            ))
+
+        # Guard the zero denominator here so the generated function stays
+        # branchless: reserve_in == 0 zeroes its term, and the fee term is
+        # zero for amount_in == 0 or a 100% fee (fee complement 0)
+        if reserve_in == 0 and (amount_in == 0 or self._fee_complement == 0):
+            return 0
+
+        # amount_out = (reserve_out * amount_in_with_fee) / (reserve_in * 10000 + amount_in_with_fee)
+        return self._get_amount_out_fast(amount_in, reserve_in, reserve_out)
+
     def get_amount_in(self, amount_out, reserve_in=None, reserve_out=None):
         """
         Calculate amount in needed for a desired amount out
-        
+
         Args:
             amount_out: Desired amount of output token
             reserve_in: Reserve of input token (optional, uses instance values if not provided)
             reserve_out: Reserve of output token (optional, uses instance values if not provided)
-            
+
         Returns:
             amount_in: Amount of input token needed
         """
@@ -80,26 +143,88 @@ class CPMMReferenceModel:
             reserve_in = self.reserve_a
         if reserve_out is None:
             reserve_out = self.reserve_b
-            
-        amount_out = Decimal(str(amount_out))
-        reserve_in = Decimal(str(reserve_in))
-        reserve_out = Decimal(str(reserve_out))
-        
+
+        # Fuzz drivers pass ints already; only coerce stray Decimals/floats
+        if type(amount_out) is not int:
+            amount_out = int(amount_out)
+        if type(reserve_in) is not int:
+            reserve_in = int(reserve_in)
+        if type(reserve_out) is not int:
+            reserve_out = int(reserve_out)
+
         # Check if sufficient liquidity
         if amount_out >= reserve_out:
             raise ValueError("Insufficient liquidity")
-        
+
         # Calculate amount in using constant product formula
-        # amount_in = (reserve_in * amount_out * MAX_FEE_BASIS_POINTS) / 
+        # amount_in = (reserve_in * amount_out * MAX_FEE_BASIS_POINTS) /
         #             ((reserve_out - amount_out) * (MAX_FEE_BASIS_POINTS - feeBasisPoints)) + 1
         numerator = reserve_in * amount_out * self.max_fee_basis_points
-        denominator = (reserve_out - amount_out) * (self.max_fee_basis_points - self.fee_basis_points)
-        
+        denominator = (reserve_out - amount_out) * self._fee_complement
+
         if denominator == 0:
-            return Decimal('0')
-            
-        amount_in = (numerator / denominator) + Decimal('1')  # Add 1 for rounding
-        return amount_in
+            return 0
+
+        return (numerator // denominator) + 1  # Add 1 for rounding
+
+    def get_amount_out_batch(self, amounts_in, reserve_in=None, reserve_out=None):
+        """
+        Vectorized get_amount_out over a whole batch of input amounts
+
+        Property-based/fuzz drivers call the scalar method thousands of
+        times; computing the batch in one NumPy expression amortizes the
+        interpreter overhead across all swaps. Falls back to a scalar
+        loop when NumPy is unavailable.
+
+        Args:
+            amounts_in: Sequence of input amounts
+            reserve_in: Reserve of input token (optional, uses instance values if not provided)
+            reserve_out: Reserve of output token (optional, uses instance values if not provided)
+
+        Returns:
+            list: Amount out for each input amount
+        """
+        if reserve_in is None:
+            reserve_in = self.reserve_a
+        if reserve_out is None:
+            reserve_out = self.reserve_b
+
+        reserve_in = int(reserve_in)
+        reserve_out = int(reserve_out)
+
+        if np is None or reserve_in == 0:
+            return [self.get_amount_out(a, reserve_in, reserve_out) for a in amounts_in]
+
+        amounts = list(map(int, amounts_in))
+        max_in = max(amounts, default=0)
+
+        # int64 is fastest but the intermediate products must not overflow;
+        # 256-bit-scale values fall back to exact bigints via dtype=object.
+        # Both the numerator and the denominator term reserve_in * 10000 +
+        # in_fee must fit, or imbalanced pools overflow/wrap
+        max_numerator = reserve_out * max_in * self._fee_complement
+        max_denominator = reserve_in * self.max_fee_basis_points + max_in * self._fee_complement
+        dtype = np.int64 if max_numerator < 2**63 and max_denominator < 2**63 else object
+
+        arr = np.array(amounts, dtype=dtype)
+
+        # Large int64-safe sweeps go through the parallel compiled kernel
+        if dtype is np.int64 and _batch_amount_out_njit is not None:
+            out = np.empty_like(arr)
+            _batch_amount_out_njit(
+                arr, reserve_in, reserve_out,
+                self._fee_complement, self.max_fee_basis_points, out
+            )
+            return [int(x) for x in out]
+
+        in_fee = arr * self._fee_complement
+        out = (reserve_out * in_fee) // (reserve_in * self.max_fee_basis_points + in_fee)
+        return [int(x) for x in out]
+
+    @staticmethod
+    def as_decimal(amount):
+        """Convert an integer amount to Decimal at the test-print boundary"""
+        return Decimal(amount)
     
     def update_reserves_after_swap(self, amount_in, amount_out, is_a_to_b=True):
         """
@@ -110,18 +235,18 @@ class CPMMReferenceModel:
             amount_out: Amount of output token
             is_a_to_b: True if swapping token A to B, False if B to A
         """
-        amount_in = Decimal(str(amount_in))
-        amount_out = Decimal(str(amount_out))
-        
+        amount_in = int(amount_in)
+        amount_out = int(amount_out)
+
         if is_a_to_b:
             self.reserve_a += amount_in
             self.reserve_b -= amount_out
         else:
             self.reserve_b += amount_in
             self.reserve_a -= amount_out
-        
-        # Update k value
-        self.k_last = self.reserve_a * self.reserve_b
+
+        # Defer k recomputation until the next invariant check
+        self._k_dirty = True
     
     def add_liquidity(self, amount_a, amount_b):
         """
@@ -134,41 +259,42 @@ class CPMMReferenceModel:
         Returns:
             tuple: (actual_a, actual_b, liquidity_minted)
         """
-        amount_a = Decimal(str(amount_a))
-        amount_b = Decimal(str(amount_b))
-        
+        amount_a = int(amount_a)
+        amount_b = int(amount_b)
+
         # For first liquidity provider
         if self.reserve_a == 0 and self.reserve_b == 0:
             actual_a = amount_a
             actual_b = amount_b
-            # Mint initial liquidity (subtract MIN_LIQUIDITY)
-            liquidity_minted = (actual_a * actual_b).sqrt() - Decimal('1000')
+            # Mint initial liquidity (subtract MIN_LIQUIDITY); amounts are
+            # token wei, so native isqrt beats a context-sensitive Decimal sqrt
+            liquidity_minted = math.isqrt(actual_a * actual_b) - self.MIN_LIQUIDITY
             self.reserve_a = actual_a
             self.reserve_b = actual_b
-            self.k_last = self.reserve_a * self.reserve_b
+            self._k_dirty = True
             return actual_a, actual_b, liquidity_minted
-        
+
         # Calculate optimal deposit amounts
-        amount_b_optimal = (amount_a * self.reserve_b) / self.reserve_a
+        amount_b_optimal = (amount_a * self.reserve_b) // self.reserve_a
         if amount_b_optimal <= amount_b:
             actual_a = amount_a
             actual_b = amount_b_optimal
         else:
-            amount_a_optimal = (amount_b * self.reserve_a) / self.reserve_b
+            amount_a_optimal = (amount_b * self.reserve_a) // self.reserve_b
             actual_a = amount_a_optimal
             actual_b = amount_b
-        
+
         # Calculate liquidity to mint
-        liquidity_a = (actual_a * self.total_supply) / self.reserve_a if self.total_supply > 0 else Decimal('0')
-        liquidity_b = (actual_b * self.total_supply) / self.reserve_b if self.total_supply > 0 else Decimal('0')
+        liquidity_a = (actual_a * self.total_supply) // self.reserve_a if self.total_supply > 0 else 0
+        liquidity_b = (actual_b * self.total_supply) // self.reserve_b if self.total_supply > 0 else 0
         liquidity_minted = min(liquidity_a, liquidity_b)
         
         # Update reserves
         self.reserve_a += actual_a
         self.reserve_b += actual_b
         self.total_supply += liquidity_minted
-        self.k_last = self.reserve_a * self.reserve_b
-        
+        self._k_dirty = True
+
         return actual_a, actual_b, liquidity_minted
     
     def check_constant_product_invariant(self):
@@ -179,6 +305,12 @@ class CPMMReferenceModel:
             tuple: (invariant_holds, current_k, expected_k)
         """
         current_k = self.reserve_a * self.reserve_b
+
+        # Reserves changed since the last check; refresh the deferred snapshot
+        if self._k_dirty:
+            self.k_last = current_k
+            self._k_dirty = False
+
         expected_k = self.k_last
         
         # For first liquidity provider or empty pool, k_last might be 0
@@ -189,23 +321,6 @@ class CPMMReferenceModel:
         # In a perfect CPMM, k should never decrease, but fees can cause it to increase
         invariant_holds = current_k >= expected_k
         return (invariant_holds, current_k, expected_k)
-    
-    def __init__(self, reserve_a=0, reserve_b=0, fee_basis_points=30):
-        """
-        Initialize CPMM reference model with additional state tracking
-        
-        Args:
-            reserve_a: Reserve of token A
-            reserve_b: Reserve of token B
-            fee_basis_points: Fee in basis points (30 = 0.3%)
-        """
-        self.reserve_a = Decimal(str(reserve_a))
-        self.reserve_b = Decimal(str(reserve_b))
-        self.fee_basis_points = Decimal(str(fee_basis_points))
-        self.max_fee_basis_points = Decimal('10000')  # 100%
-        self.k_last = self.reserve_a * self.reserve_b if self.reserve_a > 0 and self.reserve_b > 0 else Decimal('0')
-        self.total_supply = Decimal('0')
-        self.MIN_LIQUIDITY = Decimal('1000')
 
 def test_cpmm_calculations():
     """Test CPMM calculations against reference model"""
@@ -215,27 +330,33 @@ def test_cpmm_calculations():
     cpmm = CPMMReferenceModel(10000, 20000, 30)  # 10000 A, 20000 B, 0.3% fee
     amount_in = 1000
     expected_out = cpmm.get_amount_out(amount_in)
-    print(f"Swap {amount_in} A for B: {amount_in} A -> {expected_out:.18f} B")
-    
+    print(f"Swap {amount_in} A for B: {amount_in} A -> {cpmm.as_decimal(expected_out):.18f} B")
+
     # Test case 2: Large swap
     amount_in_large = 5000
     expected_out_large = cpmm.get_amount_out(amount_in_large)
-    print(f"Swap {amount_in_large} A for B: {amount_in_large} A -> {expected_out_large:.18f} B")
-    
+    print(f"Swap {amount_in_large} A for B: {amount_in_large} A -> {cpmm.as_decimal(expected_out_large):.18f} B")
+
     # Test case 3: Very small swap
     amount_in_small = 1
     expected_out_small = cpmm.get_amount_out(amount_in_small)
-    print(f"Swap {amount_in_small} A for B: {amount_in_small} A -> {expected_out_small:.18f} B")
-    
+    print(f"Swap {amount_in_small} A for B: {amount_in_small} A -> {cpmm.as_decimal(expected_out_small):.18f} B")
+
     # Test case 4: Get amount in
     amount_out = 1000
     expected_in = cpmm.get_amount_in(amount_out)
-    print(f"Get amount in for {amount_out} B: {expected_in:.18f} A needed")
+    print(f"Get amount in for {amount_out} B: {cpmm.as_decimal(expected_in):.18f} A needed")
     
     # Test case 5: Invariant check
     invariant_result = cpmm.check_constant_product_invariant()
     print(f"Invariant check: {invariant_result}")
 
+    # Test case 6: Batch swap sweep matches the scalar path
+    sweep = list(range(1, 2001))
+    batch_out = cpmm.get_amount_out_batch(sweep)
+    scalar_out = [cpmm.get_amount_out(a) for a in sweep]
+    print(f"Batch sweep matches scalar path: {batch_out == scalar_out}")
+
 def test_edge_cases():
     """Test edge cases"""
     print("\nTesting Edge Cases...")
@@ -5,11 +5,20 @@ This model implements the same logic as the Solidity Orderbook contract
 for differential testing purposes.
 """
 
-from decimal import Decimal
 from typing import List, Dict, Optional, Tuple
 from enum import Enum
 from dataclasses import dataclass
-from sortedcontainers import SortedList
+from collections import deque
+from sortedcontainers import SortedDict
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; snapshots fall back to plain lists
+    np = None
+
+# Fixed-point scale shared with the Solidity contract, built once at
+# import instead of per trade-amount calculation
+_TEN18 = 10**18
 
 
 class OrderType(Enum):
@@ -23,21 +32,30 @@ class Side(Enum):
     SELL = "SELL"
 
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     id: int
     trader: str
     token_in: str
     token_out: str
-    amount_in: Decimal
-    amount_out: Decimal
-    price: Decimal
+    # All amounts are integer token wei, mirroring the contract's
+    # uint256 semantics; Python ints are arbitrary precision anyway
+    amount_in: int
+    amount_out: int
+    price: int  # amount_out * 1e18 // amount_in, matching the contract's fixed point
     timestamp: int
     order_type: OrderType
     side: Side
+    # Key of the price level holding this order (-price for buys, price
+    # for sells) so cancels find their level in O(log n)
+    level_key: int = 0
     filled: bool = False
-    filled_amount_in: Decimal = Decimal('0')
-    filled_amount_out: Decimal = Decimal('0')
+    filled_amount_in: int = 0
+    filled_amount_out: int = 0
+    # Cached amount_in/out minus filled_amount_in/out, kept in sync by
+    # _execute_trade so matching never re-derives them per iteration
+    remaining_in: int = 0
+    remaining_out: int = 0
 
 
 class LOBReferenceModel:
@@ -49,8 +67,12 @@ class LOBReferenceModel:
     def __init__(self):
         self.next_order_id = 1
         self.orders: Dict[int, Order] = {}
-        self.buy_orders = SortedList(key=lambda x: (-x.price, x.timestamp))
-        self.sell_orders = SortedList(key=lambda x: (x.price, x.timestamp))
+        # Each side is a sorted map of price level -> FIFO deque of
+        # resting orders, so matching consumes the top level in O(1) per
+        # fill and time priority falls out of append order. Buy levels
+        # are keyed by -price so the best bid sorts first.
+        self.buy_orders: SortedDict = SortedDict()
+        self.sell_orders: SortedDict = SortedDict()
 
     def place_order(
         self,
@@ -70,41 +92,54 @@ class LOBReferenceModel:
         if token_in == token_out:
             raise ValueError("Same token")
         
-        # Calculate price as amount_out/amount_in * 1e18
-        price = Decimal(amount_out * 10**18) / Decimal(amount_in)
-        
+        # Calculate price as amount_out/amount_in * 1e18. Integer fixed
+        # point floors ratios below 1e-18 to zero, and a zero price can
+        # never be matched against (the trade math divides by it), so
+        # such orders are rejected outright
+        price = (amount_out * _TEN18) // amount_in
+        if price == 0:
+            raise ValueError("Price too low")
+
         # Create order
         order_id = self.next_order_id
         self.next_order_id += 1
-        
+
+        # Buy levels sort best (highest) price first, sell levels lowest
+        # first; time priority within a level is the deque order
+        level_key = -price if side == Side.BUY else price
+
         order = Order(
             id=order_id,
             trader=trader,
             token_in=token_in,
             token_out=token_out,
-            amount_in=Decimal(amount_in),
-            amount_out=Decimal(amount_out),
+            amount_in=amount_in,
+            amount_out=amount_out,
             price=price,
             timestamp=timestamp,
             order_type=order_type,
             side=side,
+            level_key=level_key,
             filled=False,
-            filled_amount_in=Decimal('0'),
-            filled_amount_out=Decimal('0')
+            filled_amount_in=0,
+            filled_amount_out=0,
+            remaining_in=amount_in,
+            remaining_out=amount_out
         )
         
         self.orders[order_id] = order
-        
+
         # Attempt to match order immediately
-        self._match_order(order_id)
-        
+        self._match_order(order)
+
         # If order is not fully filled and it's a limit order, add to queue
-        if not self.orders[order_id].filled and order_type == OrderType.LIMIT:
-            if side == Side.BUY:
-                self.buy_orders.add(order)
-            else:
-                self.sell_orders.add(order)
-        elif not self.orders[order_id].filled and (order_type == OrderType.IOC or order_type == OrderType.FOK):
+        if not order.filled and order_type == OrderType.LIMIT:
+            book = self.buy_orders if side == Side.BUY else self.sell_orders
+            level = book.get(level_key)
+            if level is None:
+                book[level_key] = level = deque()
+            level.append(order)
+        elif not order.filled and (order_type == OrderType.IOC or order_type == OrderType.FOK):
             # Cancel unfilled IOC/FOK orders
             self._cancel_order(order_id)
         
@@ -136,144 +171,160 @@ class LOBReferenceModel:
         # Remove from queue if it's a limit order
         if order.order_type == OrderType.LIMIT:
             if order.side == Side.BUY:
-                try:
-                    self.buy_orders.remove(order)
-                except ValueError:
-                    pass
+                self._book_remove(self.buy_orders, order)
             else:
-                try:
-                    self.sell_orders.remove(order)
-                except ValueError:
-                    pass
-        
+                self._book_remove(self.sell_orders, order)
+
         # Mark as cancelled by removing from orders dict
         del self.orders[order_id]
         return True
 
-    def _match_order(self, order_id: int):
+    @staticmethod
+    def _book_remove(book, order: Order) -> bool:
+        """Remove an order from its price level, dropping empty levels
+
+        The level lookup is O(log n); matching always consumes the level
+        head, so the popleft fast path covers full fills and only
+        mid-queue cancels walk the (small) level deque. Orders are
+        matched by identity, never by dataclass __eq__.
+
+        Returns:
+            bool: True if the order was resting in the book and removed
+        """
+        level = book.get(order.level_key)
+        if level is None:
+            return False
+
+        if level[0] is order:
+            level.popleft()
+        else:
+            # Levels are append ordered, not timestamp ordered (callers
+            # may pass arbitrary timestamps), so scan the whole deque
+            for i, resting in enumerate(level):
+                if resting is order:
+                    del level[i]
+                    break
+            else:
+                return False
+
+        if not level:
+            del book[order.level_key]
+        return True
+
+    def _match_order(self, taker_order: Order):
         """Match orders in the orderbook"""
-        if order_id not in self.orders:
-            return
-        
-        taker_order = self.orders[order_id]
         if taker_order.filled:
             return
-        
-        if taker_order.side == Side.BUY:
-            self._match_against_sell_orders(order_id)
-        else:
-            self._match_against_buy_orders(order_id)
 
-    def _match_against_sell_orders(self, buy_order_id: int):
-        """Match a buy order against sell orders"""
-        if buy_order_id not in self.orders:
+        is_buy = taker_order.side == Side.BUY
+        opp_book = self.sell_orders if is_buy else self.buy_orders
+
+        # No resting opposite orders, or the best opposite level does not
+        # cross the taker price: skip the matcher setup entirely. Buy
+        # levels are keyed by -price, so negate to recover the best bid.
+        if not opp_book:
             return
-        
-        buy_order = self.orders[buy_order_id]
-        if buy_order.filled:
+        best_key = opp_book.peekitem(0)[0]
+        best_price = best_key if is_buy else -best_key
+        if (taker_order.price < best_price) if is_buy else (best_price < taker_order.price):
             return
-        
-        remaining_amount_in = buy_order.amount_in - buy_order.filled_amount_in
-        remaining_amount_out = buy_order.amount_out - buy_order.filled_amount_out
-        
-        # Process sell orders in price-time priority order
-        i = 0
-        while i < len(self.sell_orders) and remaining_amount_in > 0:
-            sell_order = self.sell_orders[i]
-            
-            # Skip if order is already filled
-            if sell_order.filled:
-                i += 1
-                continue
-            
-            # Check if prices cross (buy price >= sell price)
-            if buy_order.price >= sell_order.price:
-                # Calculate trade amounts
-                trade_amount_in, trade_amount_out = self._calculate_trade_amounts(
-                    buy_order, sell_order, remaining_amount_in, remaining_amount_out
+
+        self._match_taker(taker_order, opp_book, is_buy)
+
+    def _match_taker(self, taker_order: Order, opp_book: SortedDict, is_buy: bool):
+        """Match a taker against the opposite book
+
+        The buy and sell sides are mirror images; is_buy selects the
+        price-cross direction and which leg of the trade the taker is.
+        """
+        remaining_amount_in = taker_order.remaining_in
+        remaining_amount_out = taker_order.remaining_out
+
+        # Hoist hot attribute lookups into locals; LOAD_FAST in the loop
+        # is much cheaper than repeated LOAD_ATTR/dict probes
+        calc_amounts = self._calculate_trade_amounts
+        execute = self._execute_trade
+        taker_price = taker_order.price
+
+        # The contract walks the opposite side with a single forward
+        # cursor (i++): makers whose trade rounds to zero or who keep
+        # residual capacity are stepped past, never rescanned, and the
+        # scan only stops on a failed price cross or a spent taker.
+        # Mirror that here with a level cursor plus an in-level position.
+        level_key = opp_book.peekitem(0)[0] if opp_book else None
+        while level_key is not None and remaining_amount_in > 0:
+            best_price = level_key if is_buy else -level_key
+
+            # Levels are price sorted: once a level fails the cross
+            # (buy price < sell price), no deeper level can match either
+            if (taker_price < best_price) if is_buy else (best_price < taker_price):
+                break
+
+            level = opp_book[level_key]
+            pos = 0
+            while pos < len(level) and remaining_amount_in > 0:
+                maker_order = level[pos]
+                buy_order, sell_order = (
+                    (taker_order, maker_order) if is_buy else (maker_order, taker_order)
                 )
-                
-                if trade_amount_in > 0 and trade_amount_out > 0:
-                    # Execute trade
-                    self._execute_trade(buy_order_id, sell_order.id, trade_amount_in, trade_amount_out)
-                    
-                    # Update remaining amounts
-                    remaining_amount_in -= trade_amount_in
-                    remaining_amount_out -= trade_amount_out
-                    i = 0  # Restart from beginning to maintain priority
-                    continue
-            
-            i += 1
-        
-        # Update buy order filled status
-        buy_order = self.orders[buy_order_id]
-        if buy_order.amount_in - buy_order.filled_amount_in == 0:
-            buy_order.filled = True
-        elif buy_order.filled_amount_in > 0:
-            pass  # Partially filled
 
-    def _match_against_buy_orders(self, sell_order_id: int):
-        """Match a sell order against buy orders"""
-        if sell_order_id not in self.orders:
-            return
-        
-        sell_order = self.orders[sell_order_id]
-        if sell_order.filled:
-            return
-        
-        remaining_amount_in = sell_order.amount_in - sell_order.filled_amount_in
-        remaining_amount_out = sell_order.amount_out - sell_order.filled_amount_out
-        
-        # Process buy orders in price-time priority order
-        i = 0
-        while i < len(self.buy_orders) and remaining_amount_in > 0:
-            buy_order = self.buy_orders[i]
-            
-            # Skip if order is already filled
-            if buy_order.filled:
-                i += 1
-                continue
-            
-            # Check if prices cross (buy price >= sell price)
-            if buy_order.price >= sell_order.price:
                 # Calculate trade amounts
-                trade_amount_in, trade_amount_out = self._calculate_trade_amounts(
+                trade_amount_in, trade_amount_out = calc_amounts(
                     buy_order, sell_order, remaining_amount_in, remaining_amount_out
                 )
-                
-                if trade_amount_in > 0 and trade_amount_out > 0:
-                    # Execute trade
-                    self._execute_trade(buy_order.id, sell_order_id, trade_amount_in, trade_amount_out)
-                    
-                    # Update remaining amounts
-                    remaining_amount_in -= trade_amount_in
-                    remaining_amount_out -= trade_amount_out
-                    i = 0  # Restart from beginning to maintain priority
+
+                if trade_amount_in <= 0 or trade_amount_out <= 0:
+                    # Rounding produced a zero-amount trade; skip this
+                    # maker and keep scanning, as the contract does
+                    pos += 1
                     continue
-            
-            i += 1
-        
-        # Update sell order filled status
-        sell_order = self.orders[sell_order_id]
-        if sell_order.amount_in - sell_order.filled_amount_in == 0:
-            sell_order.filled = True
-        elif sell_order.filled_amount_in > 0:
+
+                # Execute trade
+                buy_removed, sell_removed = execute(
+                    buy_order, sell_order, trade_amount_in, trade_amount_out
+                )
+
+                # Update remaining amounts
+                remaining_amount_in -= trade_amount_in
+                remaining_amount_out -= trade_amount_out
+
+                # A fully filled maker was deleted at pos, so the next
+                # maker slides into place; one that kept residual
+                # capacity is stepped past instead of rescanned
+                if not (sell_removed if is_buy else buy_removed):
+                    pos += 1
+
+            # An emptied level was dropped from the book by _book_remove;
+            # either way advance strictly past the current key
+            next_index = opp_book.bisect_right(level_key)
+            level_key = (
+                opp_book.peekitem(next_index)[0]
+                if next_index < len(opp_book)
+                else None
+            )
+
+        # Update taker filled status
+        if taker_order.remaining_in == 0:
+            taker_order.filled = True
+        elif taker_order.filled_amount_in > 0:
             pass  # Partially filled
 
     def _calculate_trade_amounts(
         self,
         buy_order: Order,
         sell_order: Order,
-        remaining_buy_in: Decimal,
-        remaining_buy_out: Decimal
-    ) -> Tuple[Decimal, Decimal]:
+        remaining_buy_in: int,
+        remaining_buy_out: int
+    ) -> Tuple[int, int]:
         """Calculate trade amounts based on available quantities"""
-        sell_remaining_in = sell_order.amount_in - sell_order.filled_amount_in
-        sell_remaining_out = sell_order.amount_out - sell_order.filled_amount_out
-        
-        # Use the price of the maker order (sell order) for execution
-        max_possible_in = (sell_remaining_out * Decimal(10**18)) / sell_order.price
-        max_affordable_out = (remaining_buy_in * buy_order.price) / Decimal(10**18)
+        sell_remaining_in = sell_order.remaining_in
+        sell_remaining_out = sell_order.remaining_out
+
+        # Use the price of the maker order (sell order) for execution.
+        # Multiply first, floor-divide last, so rounding happens once at
+        # the final assignment (matching the contract's mulDiv order)
+        max_possible_in = sell_remaining_out * _TEN18 // sell_order.price
+        max_affordable_out = remaining_buy_in * buy_order.price // _TEN18
         
         if max_possible_in <= remaining_buy_in and sell_remaining_out <= max_affordable_out:
             # Sell order limits the trade
@@ -296,53 +347,80 @@ class LOBReferenceModel:
 
     def _execute_trade(
         self,
-        buy_order_id: int,
-        sell_order_id: int,
-        amount_in: Decimal,
-        amount_out: Decimal
-    ):
-        """Execute a trade between two orders"""
-        if buy_order_id not in self.orders or sell_order_id not in self.orders:
-            return
-        
-        buy_order = self.orders[buy_order_id]
-        sell_order = self.orders[sell_order_id]
-        
-        # Update order states
+        buy_order: Order,
+        sell_order: Order,
+        amount_in: int,
+        amount_out: int
+    ) -> Tuple[bool, bool]:
+        """Execute a trade between two orders
+
+        Returns:
+            tuple: (buy_removed, sell_removed) — whether each side was
+            fully filled and removed from its book
+        """
+        # Update order states, keeping the cached remaining amounts in sync
         buy_order.filled_amount_in += amount_in
         buy_order.filled_amount_out += amount_out
-        
+        buy_order.remaining_in -= amount_in
+        buy_order.remaining_out -= amount_out
+
         sell_order.filled_amount_in += amount_in
         sell_order.filled_amount_out += amount_out
-        
-        # Check if orders are fully filled
-        if buy_order.filled_amount_in >= buy_order.amount_in:
+        sell_order.remaining_in -= amount_in
+        sell_order.remaining_out -= amount_out
+
+        buy_removed = False
+        sell_removed = False
+
+        # Check if orders are fully filled (a taker is not resting yet,
+        # so _book_remove reports False for it)
+        if buy_order.remaining_in <= 0:
             buy_order.filled = True
-            # Remove from buy queue
-            try:
-                self.buy_orders.remove(buy_order)
-            except ValueError:
-                pass
-        
-        if sell_order.filled_amount_in >= sell_order.amount_in:
+            buy_removed = self._book_remove(self.buy_orders, buy_order)
+
+        if sell_order.remaining_in <= 0:
             sell_order.filled = True
-            # Remove from sell queue
-            try:
-                self.sell_orders.remove(sell_order)
-            except ValueError:
-                pass
+            sell_removed = self._book_remove(self.sell_orders, sell_order)
+
+        return (buy_removed, sell_removed)
 
     def get_order(self, order_id: int) -> Optional[Order]:
         """Get order details"""
         return self.orders.get(order_id)
 
+    def snapshot_book_arrays(self, side: Side) -> dict:
+        """Pack one side of the book into parallel columnar arrays
+
+        Batch differential drivers scan whole books sequentially; a
+        struct-of-arrays layout (ints per column, NumPy when available)
+        walks contiguous memory instead of chasing one dataclass per
+        order. The live book keeps sharing the Order objects in
+        self.orders — this is a read-only export, not a copy of state.
+
+        Returns:
+            dict: order_ids, prices, timestamps, remaining_in,
+            remaining_out columns in price-time priority order
+        """
+        book = self.get_buy_orders() if side == Side.BUY else self.get_sell_orders()
+        columns = {
+            'order_ids': [o.id for o in book],
+            'prices': [o.price for o in book],
+            'timestamps': [o.timestamp for o in book],
+            'remaining_in': [o.remaining_in for o in book],
+            'remaining_out': [o.remaining_out for o in book],
+        }
+        if np is not None:
+            # Prices can exceed int64 for extreme ratios; keep exact ints
+            columns = {name: np.array(col, dtype=object) for name, col in columns.items()}
+        return columns
+
     def get_buy_orders(self) -> List[Order]:
         """Get all buy orders sorted by price-time priority"""
-        return list(self.buy_orders)
+        return [order for level in self.buy_orders.values() for order in level]
 
     def get_sell_orders(self) -> List[Order]:
         """Get all sell orders sorted by price-time priority"""
-        return list(self.sell_orders)
+        return [order for level in self.sell_orders.values() for order in level]
 
 
 # Example usage and testing
@@ -5,11 +5,58 @@ This module provides reference implementations for AMM calculations, fee calcula
 and other mathematical operations to validate against the Solidity implementation.
 """
 
+import decimal
 import math
+import warnings
 from decimal import Decimal, getcontext
 
-# Set precision for decimal calculations
-getcontext().prec = 50
+# The str-free constructors below were tuned for the C-accelerated
+# _decimal module (libmpdec); a pure-Python decimal still works, just
+# 10-50x slower, so only warn when it is in use
+if not hasattr(decimal, '__libmpdec_version__'):
+    warnings.warn("decimal is the pure-Python implementation; "
+                  "reference model math will be much slower", RuntimeWarning)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batch calls fall back to scalar loops
+    np = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; batch calls fall back to NumPy
+    njit = prange = None
+
+
+def _amm_batch_kernel(amounts_in, reserve_in, reserve_out, fee_complement, max_fee_bps):
+    """Batch swap formula over int64 arrays; compiled by Numba when available"""
+    out = np.empty_like(amounts_in)
+    for i in prange(amounts_in.shape[0]):
+        in_fee = amounts_in[i] * fee_complement
+        out[i] = (reserve_out * in_fee) // (reserve_in * max_fee_bps + in_fee)
+    return out
+
+
+if njit is not None:
+    _amm_batch_njit = njit(parallel=True, cache=True)(_amm_batch_kernel)
+else:
+    _amm_batch_njit = None
+
+# The default 28-digit context comfortably covers the fractional rate
+# math left in Decimal; libmpdec cost scales with precision, so the old
+# 50-digit setting roughly doubled every multiply/divide
+getcontext().prec = 28
+
+# Shared Decimal constants, parsed once at import instead of per call
+_BP_MAX = Decimal(10000)
+_SECONDS_PER_YEAR = Decimal(31536000)  # 365 * 24 * 60 * 60
+_PRECISION_1E18 = Decimal(10) ** 18
+_ZERO = Decimal(0)
+
+
+def _as_dec(x):
+    """Coerce to Decimal without the slow str round-trip"""
+    return x if isinstance(x, Decimal) else Decimal(x)
 
 class AMMReferenceModel:
     """Reference model for Automated Market Maker calculations"""
@@ -17,26 +64,33 @@ class AMMReferenceModel:
     def __init__(self, reserve_a=0, reserve_b=0, fee_basis_points=30):
         """
         Initialize AMM reference model
-        
+
         Args:
             reserve_a: Reserve of token A
             reserve_b: Reserve of token B
             fee_basis_points: Fee in basis points (30 = 0.3%)
         """
-        self.reserve_a = Decimal(str(reserve_a))
-        self.reserve_b = Decimal(str(reserve_b))
-        self.fee_basis_points = Decimal(str(fee_basis_points))
-        self.max_fee_basis_points = Decimal('10000')  # 100%
-    
+        self.reserve_a = int(reserve_a)
+        self.reserve_b = int(reserve_b)
+        self.fee_basis_points = int(fee_basis_points)
+        self.max_fee_basis_points = 10000  # 100%
+        # Cached invariant and spot price, refreshed only when reserves
+        # change so invariant checks don't redo the bigint multiply
+        self._k = self.reserve_a * self.reserve_b
+        self._spot = None
+
     def get_amount_out(self, amount_in, reserve_in=None, reserve_out=None):
         """
         Calculate amount out for a swap using constant product formula
-        
+
+        Pure integer math, bit-identical to the Solidity implementation's
+        uint256 discretization of the Uniswap V2 update rule.
+
         Args:
             amount_in: Amount of input token
             reserve_in: Reserve of input token (optional, uses instance values if not provided)
             reserve_out: Reserve of output token (optional, uses instance values if not provided)
-            
+
         Returns:
             amount_out: Amount of output token
         """
@@ -44,25 +98,74 @@ class AMMReferenceModel:
             reserve_in = self.reserve_a
         if reserve_out is None:
             reserve_out = self.reserve_b
-            
-        amount_in = Decimal(str(amount_in))
-        reserve_in = Decimal(str(reserve_in))
-        reserve_out = Decimal(str(reserve_out))
-        
-        # Calculate fee
-        fee = (amount_in * self.fee_basis_points) / self.max_fee_basis_points
-        amount_in_with_fee = amount_in - fee
-        
+
+        amount_in = int(amount_in)
+        reserve_in = int(reserve_in)
+        reserve_out = int(reserve_out)
+
         # Constant product formula: (x * y) = k
-        # amount_out = (reserve_out * amount_in_with_fee) / (reserve_in + amount_in_with_fee)
+        # amount_out = (reserve_out * amount_in_with_fee) / (reserve_in * 10000 + amount_in_with_fee)
+        amount_in_with_fee = amount_in * (self.max_fee_basis_points - self.fee_basis_points)
         numerator = reserve_out * amount_in_with_fee
-        denominator = reserve_in + amount_in_with_fee
-        
+        denominator = reserve_in * self.max_fee_basis_points + amount_in_with_fee
+
         if denominator == 0:
-            return Decimal('0')
-            
-        amount_out = numerator / denominator
-        return amount_out
+            return 0
+
+        return numerator // denominator
+
+    def get_amount_out_batch(self, amounts_in, reserve_in=None, reserve_out=None):
+        """
+        Vectorized get_amount_out over a batch of input amounts
+
+        Differential sweeps run thousands of independent swaps; one
+        NumPy expression amortizes the interpreter dispatch across the
+        whole batch. int64 is used when the intermediate products fit,
+        exact bigints (dtype=object) otherwise.
+
+        Args:
+            amounts_in: Sequence of input amounts
+            reserve_in: Reserve of input token (optional, uses instance values if not provided)
+            reserve_out: Reserve of output token (optional, uses instance values if not provided)
+
+        Returns:
+            list: Amount out for each input amount
+        """
+        if reserve_in is None:
+            reserve_in = self.reserve_a
+        if reserve_out is None:
+            reserve_out = self.reserve_b
+
+        reserve_in = int(reserve_in)
+        reserve_out = int(reserve_out)
+
+        if np is None or reserve_in == 0:
+            return [self.get_amount_out(a, reserve_in, reserve_out) for a in amounts_in]
+
+        amounts = list(map(int, amounts_in))
+        fee_complement = self.max_fee_basis_points - self.fee_basis_points
+        # Both sides of the division must fit int64: the numerator and
+        # the denominator term reserve_in * 10000 + in_fee
+        max_in = max(amounts, default=0)
+        max_numerator = reserve_out * max_in * fee_complement
+        max_denominator = reserve_in * self.max_fee_basis_points + max_in * fee_complement
+        dtype = np.int64 if max_numerator < 2**63 and max_denominator < 2**63 else object
+
+        arr = np.array(amounts, dtype=dtype)
+        if dtype is np.int64 and _amm_batch_njit is not None and amounts:
+            # Compiled parallel kernel: no interpreter dispatch per swap
+            # and prange scaling across cores, valid only when every
+            # intermediate product fits int64
+            out = _amm_batch_njit(arr, reserve_in, reserve_out,
+                                  fee_complement, self.max_fee_basis_points)
+        else:
+            in_fee = arr * fee_complement
+            out = (reserve_out * in_fee) // (reserve_in * self.max_fee_basis_points + in_fee)
+        return [int(x) for x in out]
+
+    def get_amount_out_decimal(self, amount_in, reserve_in=None, reserve_out=None):
+        """Legacy shim returning the integer swap result as a Decimal"""
+        return Decimal(self.get_amount_out(amount_in, reserve_in, reserve_out))
     
     def update_reserves_after_swap(self, amount_in, amount_out, is_a_to_b=True):
         """
@@ -73,9 +176,9 @@ class AMMReferenceModel:
             amount_out: Amount of output token
             is_a_to_b: True if swapping token A to B, False if B to A
         """
-        amount_in = Decimal(str(amount_in))
-        amount_out = Decimal(str(amount_out))
-        
+        amount_in = int(amount_in)
+        amount_out = int(amount_out)
+
         if is_a_to_b:
             self.reserve_a += amount_in
             self.reserve_b -= amount_out
@@ -83,55 +186,181 @@ class AMMReferenceModel:
             self.reserve_b += amount_in
             self.reserve_a -= amount_out
 
+        # Reserves changed: refresh k, invalidate the memoized spot price
+        self._k = self.reserve_a * self.reserve_b
+        self._spot = None
+
+    @property
+    def spot_price(self):
+        """Spot price of token A in token B as 1e18 fixed point, memoized until the next swap"""
+        if self._spot is None:
+            if self.reserve_a == 0:
+                self._spot = 0
+            else:
+                self._spot = (int(self.reserve_b) * 10**18) // int(self.reserve_a)
+        return self._spot
+
+    def check_k_slack(self, prev_k, bound_b):
+        """
+        Check the discretized constant product invariant
+
+        Args:
+            prev_k: k value before the operation under test
+            bound_b: Maximum allowed slack |k - prev_k|
+
+        Returns:
+            bool: True if the cached k is within bound_b of prev_k
+        """
+        return abs(self._k - prev_k) <= bound_b
+
+class UniswapV3ReferenceModel:
+    """Reference model for Uniswap V3 sqrt-price (Q64.96) math
+
+    Integer-only: math.isqrt on shifted bigints matches the on-chain
+    SqrtPriceMath/FullMath semantics bit-for-bit, with none of the cost
+    or drift of Decimal/float square roots.
+    """
+
+    Q96 = 2**96
+
+    @staticmethod
+    def sqrt_price_x96(reserve0, reserve1):
+        """
+        Calculate sqrt(reserve1 / reserve0) as a Q64.96 fixed point
+
+        Args:
+            reserve0: Reserve of token 0
+            reserve1: Reserve of token 1
+
+        Returns:
+            sqrt_price_x96: Square root price in Q64.96
+        """
+        reserve0 = int(reserve0)
+        reserve1 = int(reserve1)
+        if reserve0 <= 0:
+            raise ValueError("reserve0 must be positive")
+        return math.isqrt((reserve1 << 192) // reserve0)
+
+    @staticmethod
+    def amount0_delta(liquidity, sqrt_a_x96, sqrt_b_x96):
+        """
+        Calculate the token0 amount between two sqrt prices
+
+        amount0 = L * (sqrt_b - sqrt_a) / (sqrt_a * sqrt_b), kept in
+        integer ops with the division last to round once.
+
+        Args:
+            liquidity: Position liquidity L
+            sqrt_a_x96: One price bound in Q64.96
+            sqrt_b_x96: Other price bound in Q64.96
+
+        Returns:
+            amount0: Token0 delta
+        """
+        if sqrt_a_x96 > sqrt_b_x96:
+            sqrt_a_x96, sqrt_b_x96 = sqrt_b_x96, sqrt_a_x96
+        if sqrt_a_x96 <= 0:
+            raise ValueError("sqrt price must be positive")
+        numerator = (int(liquidity) << 96) * (sqrt_b_x96 - sqrt_a_x96)
+        return numerator // sqrt_b_x96 // sqrt_a_x96
+
+    @staticmethod
+    def amount1_delta(liquidity, sqrt_a_x96, sqrt_b_x96):
+        """
+        Calculate the token1 amount between two sqrt prices
+
+        amount1 = L * (sqrt_b - sqrt_a) / Q96
+
+        Args:
+            liquidity: Position liquidity L
+            sqrt_a_x96: One price bound in Q64.96
+            sqrt_b_x96: Other price bound in Q64.96
+
+        Returns:
+            amount1: Token1 delta
+        """
+        if sqrt_a_x96 > sqrt_b_x96:
+            sqrt_a_x96, sqrt_b_x96 = sqrt_b_x96, sqrt_a_x96
+        return int(liquidity) * (sqrt_b_x96 - sqrt_a_x96) // UniswapV3ReferenceModel.Q96
+
+
 class FeeCalculatorReferenceModel:
     """Reference model for fee calculations"""
     
     def __init__(self):
-        self.max_fee_basis_points = Decimal('10000')  # 100%
+        self.max_fee_basis_points = _BP_MAX  # 100%
     
+    def _calc_fee_dec(self, amount, fee_basis_points):
+        """Shared worker: fee on already-coerced Decimal operands"""
+        return (amount * fee_basis_points) / self.max_fee_basis_points
+
     def calculate_fee(self, amount, fee_basis_points):
         """
         Calculate fee for an amount
-        
+
         Args:
             amount: Amount to calculate fee for
             fee_basis_points: Fee in basis points
-            
+
         Returns:
             fee: Calculated fee
         """
-        amount = Decimal(str(amount))
-        fee_basis_points = Decimal(str(fee_basis_points))
-        
-        fee = (amount * fee_basis_points) / self.max_fee_basis_points
-        return fee
-    
+        return self._calc_fee_dec(_as_dec(amount), _as_dec(fee_basis_points))
+
     def calculate_fee_with_precision_check(self, amount, fee_basis_points):
         """
         Calculate fee with precision checking
-        
+
+        Coerces each operand exactly once; the safety comparison reuses
+        the same Decimal that fed the fee computation.
+
         Args:
             amount: Amount to calculate fee for
             fee_basis_points: Fee in basis points
-            
+
         Returns:
             tuple: (fee, is_safe) where is_safe indicates if fee < amount
         """
-        fee = self.calculate_fee(amount, fee_basis_points)
-        amount = Decimal(str(amount))
-        
-        is_safe = fee < amount
-        return fee, is_safe
+        amount = _as_dec(amount)
+        fee = self._calc_fee_dec(amount, _as_dec(fee_basis_points))
+        return fee, fee < amount
+
+    def calculate_fee_batch(self, amounts, fee_bps):
+        """
+        Vectorized integer fee calculation over paired input arrays
+
+        Uses the contract's floor semantics (amount * fee_bp // 10000)
+        so bulk sweeps stay bit-identical to Solidity while replacing
+        per-case Decimal dispatch with one vectorized expression.
+
+        Args:
+            amounts: Sequence of amounts
+            fee_bps: Sequence of fees in basis points, same length
+
+        Returns:
+            list: Integer fee for each (amount, fee_bp) pair
+        """
+        if np is None:
+            return [a * f // 10000 for a, f in zip(amounts, fee_bps)]
+
+        amounts = list(map(int, amounts))
+        fee_arr = list(map(int, fee_bps))
+        max_product = max(amounts, default=0) * max(fee_arr, default=0)
+        dtype = np.int64 if max_product < 2**63 else object
+
+        fees = np.array(amounts, dtype=dtype) * np.array(fee_arr, dtype=dtype) // 10000
+        return [int(x) for x in fees]
 
 class LendingReferenceModel:
     """Reference model for lending calculations"""
     
-    def __init__(self, precision=Decimal('1e18')):
+    def __init__(self, precision=_PRECISION_1E18):
         self.precision = precision
-        self.total_supplied = Decimal('0')
-        self.total_borrowed = Decimal('0')
-        self.borrow_rate = Decimal('0')  # Annual rate
-        self.last_update = Decimal('0')
+        self.total_supplied = _ZERO
+        self.total_borrowed = _ZERO
+        self.borrow_rate = _ZERO  # Annual rate
+        self._rate_per_second = _ZERO  # Derived from borrow_rate, cached
+        self.last_update = _ZERO
     
     def set_borrow_rate(self, rate):
         """
@@ -140,8 +369,11 @@ class LendingReferenceModel:
         Args:
             rate: Annual borrow rate (scaled by precision)
         """
-        self.borrow_rate = Decimal(str(rate))
-        self.last_update = Decimal(str(self._current_time()))
+        self.borrow_rate = _as_dec(rate)
+        # The per-second rate only changes here, so pay the Decimal
+        # divide once per rate update instead of once per interest call
+        self._rate_per_second = self.borrow_rate / _SECONDS_PER_YEAR
+        self.last_update = self._current_time()
     
     def calculate_interest(self, amount, time_elapsed):
         """
@@ -154,12 +386,10 @@ class LendingReferenceModel:
         Returns:
             interest: Calculated interest
         """
-        amount = Decimal(str(amount))
-        time_elapsed = Decimal(str(time_elapsed))
-        
-        # Convert annual rate to per second
-        rate_per_second = self.borrow_rate / Decimal('31536000')  # 365 * 24 * 60 * 60
-        interest = (amount * rate_per_second * time_elapsed) / self.precision
+        amount = _as_dec(amount)
+        time_elapsed = _as_dec(time_elapsed)
+
+        interest = (amount * self._rate_per_second * time_elapsed) / self.precision
         return interest
     
     def check_conservation_invariant(self):
@@ -179,7 +409,7 @@ class LendingReferenceModel:
             utilization_rate: Utilization rate scaled by precision
         """
         if self.total_supplied == 0:
-            return Decimal('0')
+            return _ZERO
         return (self.total_borrowed * self.precision) / self.total_supplied
     
     def _current_time(self):
@@ -206,6 +436,27 @@ def test_amm_calculations():
     expected_out_small = amm.get_amount_out(amount_in_small)
     print(f"Swap {amount_in_small} A for B: {amount_in_small} A -> {expected_out_small:.18f} B")
 
+def test_v3_sqrt_price_calculations():
+    """Test Uniswap V3 sqrt-price math against reference model"""
+    print("\nTesting V3 Sqrt-Price Calculations...")
+
+    v3 = UniswapV3ReferenceModel()
+
+    # 1:1 pool => sqrt price equals Q96 exactly
+    sqrt_one = v3.sqrt_price_x96(10**18, 10**18)
+    print(f"Sqrt price for 1:1 pool: {sqrt_one} (Q96 = {v3.Q96})")
+
+    # 1:4 pool => sqrt price doubles
+    sqrt_four = v3.sqrt_price_x96(10**18, 4 * 10**18)
+    print(f"Sqrt price for 1:4 pool: {sqrt_four}")
+
+    # Token deltas across the two prices
+    liquidity = 10**21
+    amount0 = v3.amount0_delta(liquidity, sqrt_one, sqrt_four)
+    amount1 = v3.amount1_delta(liquidity, sqrt_one, sqrt_four)
+    print(f"amount0 delta for L={liquidity}: {amount0}")
+    print(f"amount1 delta for L={liquidity}: {amount1}")
+
 def test_fee_calculations():
     """Test fee calculations against reference model"""
     print("\nTesting Fee Calculations...")
@@ -224,6 +475,11 @@ def test_fee_calculations():
         fee, is_safe = fee_calc.calculate_fee_with_precision_check(amount, fee_bp)
         print(f"Fee for {amount} tokens at {fee_bp/100:.2f}%: {fee:.18f} tokens (Safe: {is_safe})")
 
+    # Batch sweep over the same cases via the vectorized path
+    amounts, fee_bps = zip(*test_cases)
+    batch_fees = fee_calc.calculate_fee_batch(amounts, fee_bps)
+    print(f"Batch fees (floor semantics): {batch_fees}")
+
 def test_lending_calculations():
     """Test lending calculations against reference model"""
     print("\nTesting Lending Calculations...")
@@ -250,6 +506,7 @@ if __name__ == "__main__":
     print("=" * 50)
     
     test_amm_calculations()
+    test_v3_sqrt_price_calculations()
     test_fee_calculations()
     test_lending_calculations()
     
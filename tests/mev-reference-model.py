@@ -6,15 +6,21 @@ for differential testing purposes.
 """
 
 from decimal import Decimal
-from typing import List, Dict, Optional, Tuple
+from typing import ClassVar, Iterable, List, Dict, Optional, Tuple
 from dataclasses import dataclass
-from collections import deque
+from collections import defaultdict, deque
+import hashlib
 import time
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the reveal history falls back to lists
+    np = None
 
-@dataclass
+
+@dataclass(slots=True)
 class Commitment:
-    commitment_hash: str
+    commitment_hash: bytes
     timestamp: int
     block_number: int
     user: str
@@ -24,14 +30,45 @@ class Commitment:
     max_fee_per_gas: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Batch:
     batch_id: int
     start_time: int
     end_time: int
-    orders: List[dict]
+    # Orders in struct-of-arrays form: parallel columns keep the price
+    # vector contiguous so clearing sorts one int array instead of
+    # key-extracting from a list of dicts
+    order_prices: List[int]
+    order_sizes: List[int]
+    order_users: List[str]
+    order_sides: List[int]  # 1 = buy, -1 = sell
     executed: bool
-    clearing_price: Decimal
+    # Q18 fixed-point int, matching the contract's uint256 price
+    clearing_price: int
+
+    PRICE_SCALE: ClassVar[int] = 10**18
+
+    @property
+    def clearing_price_decimal(self) -> Decimal:
+        """Clearing price as a Decimal, built lazily for legacy callers"""
+        return Decimal(self.clearing_price)
+
+    def add_order(self, price: int, size: int, user: str, side: int):
+        """Append one order across the parallel columns"""
+        self.order_prices.append(price)
+        self.order_sizes.append(size)
+        self.order_users.append(user)
+        self.order_sides.append(side)
+
+    def price_sorted_indices(self):
+        """Order indices sorted by price, ready for clearing
+
+        np.argsort on the contiguous int64 price column when NumPy is
+        available; a key-on-getitem sort otherwise.
+        """
+        if np is not None:
+            return np.argsort(np.asarray(self.order_prices, dtype=np.int64), kind='stable')
+        return sorted(range(len(self.order_prices)), key=self.order_prices.__getitem__)
 
 
 class MEVReferenceModel:
@@ -40,6 +77,23 @@ class MEVReferenceModel:
     Implements commit-reveal scheme, batch auctions, and anti-sandwich protection
     """
 
+    # Policy constants mirroring the contract's constant-folded values;
+    # class-level so every instance shares one PyLong per threshold
+    MIN_STAKE_WEI = 10**18
+    ONE_ETH = MIN_STAKE_WEI
+    MIN_GAS_LIMIT = 50000
+    MAX_GAS_LIMIT = 10000000
+    # Fixed layout of the per-user reveal-history ring buffer
+    MAX_TRACKED_USERS = 1024
+    REVEAL_HISTORY_WINDOW = 8
+    # Commitments older than this can never be revealed; batch
+    # execution sweeps them so long runs keep a bounded working set
+    COMMITMENT_TTL = 3600
+    # Base added to the monotonic clock: monotonic_ns can start near
+    # zero (e.g. right after boot), and the anti-sandwich fast path
+    # assumes the model timestamp always dwarfs the window
+    CLOCK_EPOCH_OFFSET = 1 << 32
+
     def __init__(self, commit_phase_duration: int = 5, reveal_phase_duration: int = 5, 
                  batch_interval: int = 12, anti_sandwich_window: int = 2):
         """
@@ -51,52 +105,75 @@ class MEVReferenceModel:
             batch_interval: Interval between batches in seconds
             anti_sandwich_window: Anti-sandwich protection window in seconds
         """
-        self.commitments: Dict[str, Commitment] = {}
-        self.user_stakes: Dict[str, int] = {}
-        self.last_reveal_time: Dict[str, int] = {}
+        # Commit ids are (hash, user, timestamp, block) tuples — tuple
+        # hashing is C-level per field, cheaper than building and
+        # hashing a formatted string for every commit and lookup
+        self.commitments: Dict[Tuple[bytes, str, int, int], Commitment] = {}
+        # Secondary index so reveal() finds its open commitment in O(1)
+        # instead of scanning every historical commitment. One (hash,
+        # user) pair can hold several open commitments (the primary key
+        # also includes timestamp/block), so each entry is a FIFO deque
+        # and reveals resolve oldest-first like the original scan
+        self._open_by_hash_user: Dict[Tuple[bytes, str], deque] = defaultdict(deque)
+        # defaultdict(int) turns the check-then-update idiom into a
+        # single hash lookup on the stake and reveal-time hot paths
+        self.user_stakes: Dict[str, int] = defaultdict(int)
+        self.last_reveal_time: Dict[str, int] = defaultdict(int)
         self.batches: Dict[int, Batch] = {}
+        # Recent reveal timestamps as one contiguous (users, window)
+        # ring buffer rather than a deque per user: pattern scans
+        # across all users become a single vectorized comparison
+        if np is not None:
+            self._reveal_history = np.zeros(
+                (self.MAX_TRACKED_USERS, self.REVEAL_HISTORY_WINDOW), dtype=np.int64)
+            self._reveal_head = np.zeros(self.MAX_TRACKED_USERS, dtype=np.int32)
+        else:
+            self._reveal_history = [
+                [0] * self.REVEAL_HISTORY_WINDOW for _ in range(self.MAX_TRACKED_USERS)]
+            self._reveal_head = [0] * self.MAX_TRACKED_USERS
+        self._user_index: Dict[str, int] = {}
         
         self.commit_phase_duration = commit_phase_duration
         self.reveal_phase_duration = reveal_phase_duration
         self.batch_interval = batch_interval
         self.anti_sandwich_window = anti_sandwich_window
-        self.min_gas_limit = 50000
-        self.max_gas_limit = 10000000
-        self.last_batch_end_time = int(time.time())
-        
-        self.current_timestamp = int(time.time())
+        # Monotonic integer clock: no float divide-and-truncate as in
+        # int(time.time()), and immune to wall-clock jumps mid-test.
+        # The fixed base keeps the epoch far above any reveal window
+        now = self.CLOCK_EPOCH_OFFSET + time.monotonic_ns() // 1_000_000_000
+        self.last_batch_end_time = now
+
+        self.current_timestamp = now
         self.current_block_number = 1000000
 
     def add_stake(self, user: str, amount: int):
         """Add stake for a user"""
-        if user not in self.user_stakes:
-            self.user_stakes[user] = 0
         self.user_stakes[user] += amount
 
     def remove_stake(self, user: str, amount: int):
         """Remove stake for a user"""
-        if user not in self.user_stakes or self.user_stakes[user] < amount:
+        if self.user_stakes[user] < amount:
             raise ValueError("Insufficient stake")
         self.user_stakes[user] -= amount
 
-    def commit(self, user: str, commitment_hash: str, gas_limit: int, max_fee_per_gas: int):
+    def commit(self, user: str, commitment_hash: bytes, gas_limit: int, max_fee_per_gas: int):
         """Commit to a transaction"""
         # Check batch interval
         if self.current_timestamp < self.last_batch_end_time + self.batch_interval:
             raise RuntimeError("Batch interval not respected")
         
         # Check gas limits
-        if gas_limit < self.min_gas_limit or gas_limit > self.max_gas_limit:
+        if gas_limit < self.MIN_GAS_LIMIT or gas_limit > self.MAX_GAS_LIMIT:
             raise ValueError("Gas limit out of bounds")
         
         if max_fee_per_gas <= 0:
             raise ValueError("Max fee per gas must be positive")
         
         # Check user stake
-        if user not in self.user_stakes or self.user_stakes[user] < 1000000000000000000:  # 1 ETH
+        if self.user_stakes[user] < self.MIN_STAKE_WEI:
             raise PermissionError("Insufficient stake")
         
-        commit_id = f"{commitment_hash}_{user}_{self.current_timestamp}_{self.current_block_number}"
+        commit_id = (commitment_hash, user, self.current_timestamp, self.current_block_number)
         
         if commit_id in self.commitments:
             raise ValueError("Commitment already exists")
@@ -111,32 +188,28 @@ class MEVReferenceModel:
             gas_limit=gas_limit,
             max_fee_per_gas=max_fee_per_gas
         )
-        
+        self._open_by_hash_user[(commitment_hash, user)].append(commit_id)
+
         return commit_id
 
     def reveal(self, user: str, data: bytes, salt: str):
         """Reveal a committed transaction"""
-        # Check anti-sandwich window
-        if user in self.last_reveal_time:
-            if self.current_timestamp < self.last_reveal_time[user] + self.anti_sandwich_window:
-                raise RuntimeError("Anti-sandwich window active")
+        # Check anti-sandwich window; the defaultdict zero baseline is
+        # safe because current_timestamp is always far larger than the
+        # window, so an untracked user can never trip the comparison
+        if self.current_timestamp - self.last_reveal_time[user] < self.anti_sandwich_window:
+            raise RuntimeError("Anti-sandwich window active")
         
-        # Create commitment hash and ID
+        # Recompute the hash and look up the open commitments directly;
+        # the index only holds unrevealed entries, oldest first
         commitment_hash = self._hash_data_and_salt(data, salt)
-        commit_id = f"{commitment_hash}_{user}_{self.commitments.get(commitment_hash, Commitment('', 0, 0, '', False, b'', 0, 0)).timestamp}_{self.commitments.get(commitment_hash, Commitment('', 0, 0, '', False, b'', 0, 0)).block_number}"
-        
-        # Find the actual commitment
-        actual_commit_id = None
-        for cid, commitment in self.commitments.items():
-            if (commitment.commitment_hash == commitment_hash and 
-                commitment.user == user and 
-                not commitment.revealed):
-                actual_commit_id = cid
-                break
-        
-        if not actual_commit_id:
+        index_key = (commitment_hash, user)
+        open_queue = self._open_by_hash_user.get(index_key)
+
+        if not open_queue:
             raise ValueError("No commitment found")
-        
+
+        actual_commit_id = open_queue[0]
         commitment = self.commitments[actual_commit_id]
         
         # Check timing constraints
@@ -149,17 +222,23 @@ class MEVReferenceModel:
         if commitment_hash != commitment.commitment_hash:
             raise ValueError("Invalid commitment")
         
-        # Update commitment
+        # Update commitment and retire it from the open index
         commitment.revealed = True
         commitment.data = data
         self.commitments[actual_commit_id] = commitment
+        open_queue.popleft()
+        if not open_queue:
+            del self._open_by_hash_user[index_key]
         
-        # Update last reveal time
+        # Update last reveal time and the ring-buffer history
         self.last_reveal_time[user] = self.current_timestamp
+        self._record_reveal(user, self.current_timestamp)
         
-        # Execute transaction
+        # Execute transaction, then evict the finished commitment so
+        # revealed entries don't accumulate for the life of the model
         self._execute_transaction(data)
-        
+        del self.commitments[actual_commit_id]
+
         return actual_commit_id
 
     def execute_batch(self):
@@ -167,14 +246,33 @@ class MEVReferenceModel:
         if self.current_timestamp < self.last_batch_end_time + self.batch_interval:
             raise RuntimeError("Batch interval not reached")
         
+        # Sweep commitments whose reveal window is long gone
+        cutoff = self.last_batch_end_time - self.COMMITMENT_TTL
+        stale = [k for k, c in self.commitments.items() if c.timestamp < cutoff]
+        for key in stale:
+            commitment = self.commitments.pop(key)
+            if commitment.revealed:
+                continue  # only open commitments are indexed
+            index_key = (commitment.commitment_hash, commitment.user)
+            queue = self._open_by_hash_user.get(index_key)
+            if queue is not None:
+                # Drop exactly this commit id; a newer open commitment
+                # under the same (hash, user) key must stay revealable
+                queue.remove(key)
+                if not queue:
+                    del self._open_by_hash_user[index_key]
+
         batch_id = self.current_timestamp // self.batch_interval
-        clearing_price = Decimal('1000000000000000000')  # 1e18 placeholder
+        clearing_price = Batch.PRICE_SCALE  # 1e18 placeholder
         
         self.batches[batch_id] = Batch(
             batch_id=batch_id,
             start_time=self.last_batch_end_time,
             end_time=self.current_timestamp,
-            orders=[],
+            order_prices=[],
+            order_sizes=[],
+            order_users=[],
+            order_sides=[],
             executed=True,
             clearing_price=clearing_price
         )
@@ -188,11 +286,64 @@ class MEVReferenceModel:
         # In a real implementation, this would execute the actual transaction
         pass
 
-    def _hash_data_and_salt(self, data: bytes, salt: str) -> str:
-        """Hash data and salt (simplified)"""
-        return f"hash_{data.hex()}_{salt}"
+    def _hash_data_and_salt(self, data: bytes, salt: str) -> bytes:
+        """Hash data and salt into a fixed 32-byte digest
+
+        A constant-size commitment analogous to the contract's
+        keccak256(abi.encode(data, salt)) — NIST SHA-3 pads differently
+        from keccak256, so digests are internally consistent but never
+        bit-equal to on-chain ones. sha3_256 keeps commit ids at 32
+        bytes instead of hex strings that grow with the payload.
+        """
+        h = hashlib.sha3_256()
+        h.update(data)
+        h.update(salt.encode())
+        return h.digest()
+
+    def _record_reveal(self, user: str, timestamp: int):
+        """Append a reveal timestamp to the user's ring-buffer slot"""
+        row = self._user_index.get(user)
+        if row is None:
+            row = len(self._user_index)
+            if row >= self.MAX_TRACKED_USERS:
+                return  # history is best-effort beyond the fixed capacity
+            self._user_index[user] = row
+        head = self._reveal_head[row]
+        self._reveal_history[row][head] = timestamp
+        self._reveal_head[row] = (head + 1) % self.REVEAL_HISTORY_WINDOW
+
+    def users_revealed_since(self, threshold: int) -> List[str]:
+        """Users with any recorded reveal newer than threshold
+
+        With NumPy this is one comparison over the whole history matrix
+        instead of a Python loop per user per slot.
+        """
+        if np is not None:
+            mask = (self._reveal_history > threshold).any(axis=1)
+            return [user for user, row in self._user_index.items() if mask[row]]
+        return [user for user, row in self._user_index.items()
+                if any(t > threshold for t in self._reveal_history[row])]
+
+    def bulk_seed(self, commits: Iterable[Commitment]):
+        """Seed many historical commitments in one pass
+
+        Replay harnesses should prefer this over looped commit(): both
+        dicts are rebuilt from a single materialized list, so the seed
+        costs one construction each instead of an incremental-growth
+        rehash cascade, and none of the per-commit policy checks run.
+        """
+        items = [
+            ((c.commitment_hash, c.user, c.timestamp, c.block_number), c)
+            for c in commits
+        ]
+        self.commitments = dict(items)
+        open_index = defaultdict(deque)
+        for key, c in items:
+            if not c.revealed:
+                open_index[(c.commitment_hash, c.user)].append(key)
+        self._open_by_hash_user = open_index
 
-    def get_commitment(self, commit_id: str) -> Optional[Commitment]:
+    def get_commitment(self, commit_id: Tuple[bytes, str, int, int]) -> Optional[Commitment]:
         """Get commitment details"""
         return self.commitments.get(commit_id)
 
@@ -1,338 +1,423 @@
-#!/usr/bin/env python3
-"""
-Reference Model for Oracle Manipulation/Liveness
-This model implements the same logic as the Solidity Oracle contract
-for differential testing purposes.
-"""
-
-from decimal import Decimal
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
-from collections import deque
-import time
-
-
-@dataclass
-class PriceFeed:
-    price: Decimal
-    timestamp: int
-    is_valid: bool
-
-
-@dataclass
-class TWAPDataPoint:
-    price: Decimal
-    timestamp: int
-
-
-class OracleReferenceModel:
-    """
-    Reference model for Oracle manipulation/liveness protection
-    Implements medianization, TWAP, outlier detection, and staleness protection
-    """
-
-    def __init__(self, staleness_threshold: int = 600, outlier_threshold: Decimal = Decimal('0.05')):
-        """
-        Initialize Oracle reference model
-        
-        Args:
-            staleness_threshold: Maximum age of price feeds in seconds
-            outlier_threshold: Maximum deviation threshold (5% default)
-        """
-        self.price_feeds: Dict[str, Dict[str, List[PriceFeed]]] = {}
-        self.is_valid_publisher: Dict[str, bool] = {}
-        self.last_valid_price: Dict[str, Decimal] = {}
-        self.twap_history: Dict[str, deque] = {}  # Using deque for efficient operations
-        self.publishers: List[str] = []
-        self.is_emergency_shutdown = False
-        self.fallback_oracle = None
-        self.staleness_threshold = staleness_threshold
-        self.outlier_threshold = outlier_threshold
-        self.current_timestamp = int(time.time())
-
-    def add_publisher(self, publisher: str):
-        """Add a valid price publisher"""
-        if publisher in self.is_valid_publisher and self.is_valid_publisher[publisher]:
-            raise ValueError("Already a publisher")
-        
-        self.is_valid_publisher[publisher] = True
-        self.publishers.append(publisher)
-
-    def remove_publisher(self, publisher: str):
-        """Remove a price publisher"""
-        if publisher not in self.is_valid_publisher or not self.is_valid_publisher[publisher]:
-            raise ValueError("Not a publisher")
-        
-        self.is_valid_publisher[publisher] = False
-        self.publishers.remove(publisher)
-
-    def set_fallback_oracle(self, fallback_oracle):
-        """Set fallback oracle"""
-        self.fallback_oracle = fallback_oracle
-
-    def set_staleness_threshold(self, threshold: int):
-        """Set staleness threshold"""
-        self.staleness_threshold = threshold
-
-    def set_outlier_threshold(self, threshold: Decimal):
-        """Set outlier threshold"""
-        self.outlier_threshold = threshold
-
-    def publish_price(self, token: str, publisher: str, price: int):
-        """Publish a price feed"""
-        if self.is_emergency_shutdown:
-            raise RuntimeError("Oracle shutdown")
-        
-        if publisher not in self.is_valid_publisher or not self.is_valid_publisher[publisher]:
-            raise PermissionError("Not a valid publisher")
-        
-        if price <= 0:
-            raise ValueError("Price must be positive")
-        
-        # Initialize token structure if needed
-        if token not in self.price_feeds:
-            self.price_feeds[token] = {}
-        
-        if publisher not in self.price_feeds[token]:
-            self.price_feeds[token][publisher] = []
-        
-        # Add new price feed
-        feed = PriceFeed(
-            price=Decimal(price),
-            timestamp=self.current_timestamp,
-            is_valid=True
-        )
-        self.price_feeds[token][publisher].append(feed)
-        
-        # Update last valid price
-        self.last_valid_price[token] = Decimal(price)
-        
-        # Add to TWAP history
-        if token not in self.twap_history:
-            self.twap_history[token] = deque()
-        
-        twap_point = TWAPDataPoint(
-            price=Decimal(price),
-            timestamp=self.current_timestamp
-        )
-        self.twap_history[token].append(twap_point)
-        
-        # Clean up old TWAP data
-        self._cleanup_twap_history(token)
-
-    def get_price(self, token: str) -> Tuple[Decimal, int]:
-        """Get the current price for a token"""
-        if self.is_emergency_shutdown:
-            raise RuntimeError("Oracle shutdown")
-        
-        # Try to get median price from active publishers
-        prices = self._get_valid_prices(token)
-        
-        if not prices:
-            # No valid prices, try fallback oracle
-            if self.fallback_oracle is not None:
-                try:
-                    return self.fallback_oracle.get_price(token)
-                except Exception:
-                    raise RuntimeError("No valid price available")
-            raise RuntimeError("No valid price available")
-        
-        # Calculate median price
-        price = self._calculate_median(prices)
-        timestamp = self.current_timestamp
-        
-        return (price, timestamp)
-
-    def get_twap_price(self, token: str, window: int) -> Tuple[Decimal, int]:
-        """Get the TWAP price for a token"""
-        if self.is_emergency_shutdown:
-            raise RuntimeError("Oracle shutdown")
-        
-        if token not in self.twap_history or not self.twap_history[token]:
-            raise ValueError("No TWAP history")
-        
-        history = self.twap_history[token]
-        end_time = self.current_timestamp
-        start_time = end_time - window
-        
-        # Find the start index
-        start_index = 0
-        for i, point in enumerate(history):
-            if point.timestamp >= start_time:
-                start_index = i
-                break
-        
-        # Calculate TWAP
-        sum_price = Decimal('0')
-        count = 0
-        
-        for i in range(start_index, len(history)):
-            sum_price += history[i].price
-            count += 1
-        
-        if count == 0:
-            raise ValueError("No data points in window")
-        
-        price = sum_price / Decimal(count)
-        timestamp = end_time
-        
-        return (price, timestamp)
-
-    def emergency_shutdown(self):
-        """Emergency shutdown of the oracle"""
-        self.is_emergency_shutdown = True
-
-    def resume_operations(self):
-        """Resume oracle operations after emergency shutdown"""
-        self.is_emergency_shutdown = False
-
-    def _get_valid_prices(self, token: str) -> List[Decimal]:
-        """Get valid prices from active publishers"""
-        if token not in self.price_feeds:
-            return []
-        
-        valid_prices = []
-        
-        for publisher in self.publishers:
-            if not self.is_valid_publisher.get(publisher, False):
-                continue
-            
-            if publisher not in self.price_feeds[token]:
-                continue
-            
-            feeds = self.price_feeds[token][publisher]
-            if not feeds:
-                continue
-            
-            latest_feed = feeds[-1]
-            if not latest_feed.is_valid:
-                continue
-            
-            # Check for staleness
-            if self.current_timestamp - latest_feed.timestamp > self.staleness_threshold:
-                continue
-            
-            # Check for outliers
-            if token in self.last_valid_price and self.last_valid_price[token] > 0:
-                deviation = self._calculate_deviation(latest_feed.price, self.last_valid_price[token])
-                if deviation > self.outlier_threshold:
-                    continue
-            
-            valid_prices.append(latest_feed.price)
-        
-        return valid_prices
-
-    def _calculate_median(self, array: List[Decimal]) -> Decimal:
-        """Calculate median of an array"""
-        if not array:
-            raise ValueError("Empty array")
-        
-        # Sort array
-        sorted_array = sorted(array)
-        length = len(sorted_array)
-        
-        if length % 2 == 0:
-            # Even number of elements
-            median = (sorted_array[length // 2 - 1] + sorted_array[length // 2]) / 2
-        else:
-            # Odd number of elements
-            median = sorted_array[length // 2]
-        
-        return median
-
-    def _calculate_deviation(self, price1: Decimal, price2: Decimal) -> Decimal:
-        """Calculate deviation between two prices"""
-        if price2 == 0:
-            return Decimal('0')
-        
-        if price1 > price2:
-            deviation = ((price1 - price2) * Decimal('1000000000000000000')) / price2
-        else:
-            deviation = ((price2 - price1) * Decimal('1000000000000000000')) / price2
-        
-        return deviation
-
-    def _cleanup_twap_history(self, token: str):
-        """Clean up old TWAP history data"""
-        if token not in self.twap_history:
-            return
-        
-        history = self.twap_history[token]
-        cutoff_time = self.current_timestamp - (self.staleness_threshold * 2)
-        
-        # Remove old data from the front
-        while history and history[0].timestamp < cutoff_time:
-            history.popleft()
-
-    def get_publisher_count(self) -> int:
-        """Get number of active publishers"""
-        count = 0
-        for publisher in self.publishers:
-            if self.is_valid_publisher.get(publisher, False):
-                count += 1
-        return count
-
-    def is_quorum_met(self, token: str) -> bool:
-        """Check if quorum is met (at least 2 publishers)"""
-        valid_count = 0
-        
-        for publisher in self.publishers:
-            if not self.is_valid_publisher.get(publisher, False):
-                continue
-            
-            if token not in self.price_feeds or publisher not in self.price_feeds[token]:
-                continue
-            
-            feeds = self.price_feeds[token][publisher]
-            if not feeds:
-                continue
-            
-            latest_feed = feeds[-1]
-            if not latest_feed.is_valid:
-                continue
-            
-            # Check for staleness
-            if self.current_timestamp - latest_feed.timestamp > self.staleness_threshold:
-                continue
-            
-            valid_count += 1
-        
-        return valid_count >= 2
-
-    def advance_time(self, seconds: int):
-        """Advance the current timestamp for testing"""
-        self.current_timestamp += seconds
-
-
-# Example usage and testing
-if __name__ == "__main__":
-    # Create oracle reference model
-    oracle = OracleReferenceModel(staleness_threshold=600, outlier_threshold=Decimal('0.05'))
-    
-    # Add publishers
-    oracle.add_publisher("publisher1")
-    oracle.add_publisher("publisher2")
-    oracle.add_publisher("publisher3")
-    
-    # Publish prices
-    oracle.publish_price("ETH", "publisher1", 1000 * 10**18)  # $1000
-    oracle.publish_price("ETH", "publisher2", 1050 * 10**18)  # $1050
-    oracle.publish_price("ETH", "publisher3", 950 * 10**18)   # $950
-    
-    # Get median price
-    price, timestamp = oracle.get_price("ETH")
-    print(f"Median price: {price}")
-    
-    # Advance time and publish more prices for TWAP
-    oracle.advance_time(600)  # Advance 10 minutes
-    oracle.publish_price("ETH", "publisher1", 1100 * 10**18)  # $1100
-    
-    oracle.advance_time(600)  # Advance 10 minutes
-    oracle.publish_price("ETH", "publisher1", 900 * 10**18)   # $900
-    
-    # Get TWAP price
-    twap_price, twap_timestamp = oracle.get_twap_price("ETH", 1800)  # 30-minute window
-    print(f"TWAP price: {twap_price}")
-    
-    # Check quorum
+#!/usr/bin/env python3
+"""
+Reference Model for Oracle Manipulation/Liveness
+This model implements the same logic as the Solidity Oracle contract
+for differential testing purposes.
+"""
+
+from bisect import bisect_left
+from decimal import Decimal
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass
+import time
+
+
+# 1e18 fixed-point scale shared by prices and deviation ratios
+_WAD = 10**18
+
+
+def _quickselect(values: List[int], k: int) -> int:
+    """Select the k-th smallest element in-place via Hoare partitioning
+
+    Average O(n) versus O(n log n) for a full sort; median-of-three
+    pivoting guards against the quadratic worst case on sorted input.
+    On return, every element left of index k is <= the result.
+    """
+    lo, hi = 0, len(values) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        a, b, c = values[lo], values[mid], values[hi]
+        pivot = max(min(a, b), min(max(a, b), c))
+        i, j = lo, hi
+        while i <= j:
+            while values[i] < pivot:
+                i += 1
+            while values[j] > pivot:
+                j -= 1
+            if i <= j:
+                values[i], values[j] = values[j], values[i]
+                i += 1
+                j -= 1
+        if k <= j:
+            hi = j
+        elif k >= i:
+            lo = i
+        else:
+            break
+    return values[k]
+
+
+@dataclass(slots=True)
+class PriceFeed:
+    price: int  # wei, 1e18-scaled as on-chain
+    timestamp: int
+    is_valid: bool
+
+
+class OracleReferenceModel:
+    """
+    Reference model for Oracle manipulation/liveness protection
+    Implements medianization, TWAP, outlier detection, and staleness protection
+    """
+
+    def __init__(self, staleness_threshold: int = 600, outlier_threshold: Decimal = Decimal('0.05')):
+        """
+        Initialize Oracle reference model
+        
+        Args:
+            staleness_threshold: Maximum age of price feeds in seconds
+            outlier_threshold: Maximum deviation threshold (5% default)
+        """
+        # One latest-feed slot per (token, publisher): nothing ever read
+        # past the newest feed, so keeping a full list per publisher
+        # only accumulated garbage on every publish
+        self.price_feeds: Dict[str, Dict[str, PriceFeed]] = {}
+        # Membership in this set IS the validity flag: O(1) add,
+        # remove, and count with no parallel bool dict to keep in sync
+        self.active_publishers: set = set()
+        self.last_valid_price: Dict[str, int] = {}
+        # TWAP history as parallel timestamp/price arrays per token:
+        # timestamps are append-only and sorted, so window starts come
+        # from bisect instead of a linear scan
+        self.twap_timestamps: Dict[str, List[int]] = {}
+        self.twap_prices: Dict[str, List[int]] = {}
+        # Running prefix sums over twap_prices so a windowed sum is two
+        # lookups; values stay absolute across evictions, with the total
+        # of everything already evicted kept per token so cumsum[i] -
+        # base is always the sum of the retained entries up to i
+        self.twap_cumsum: Dict[str, List[int]] = {}
+        self._twap_evicted_sum: Dict[str, int] = {}
+        # Eviction is amortized: each token is swept at most once per
+        # staleness window instead of on every publish
+        self._next_cleanup_ts: Dict[str, int] = {}
+        # Logical start of the live window within the arrays; eviction
+        # advances this offset and only compacts the storage once more
+        # than half of it is dead
+        self._twap_head: Dict[str, int] = {}
+        # Latest-feed mirror in struct-of-arrays form, indexed by a
+        # stable publisher id: the validity scan walks parallel lists
+        # instead of nested dicts, feed lists, and dataclass fields
+        self.publisher_id: Dict[str, int] = {}
+        self._publisher_valid: List[bool] = []
+        self._latest_price: Dict[str, List[int]] = {}
+        self._latest_ts: Dict[str, List[int]] = {}
+        self.is_emergency_shutdown = False
+        self.fallback_oracle = None
+        self.staleness_threshold = staleness_threshold
+        self.outlier_threshold = outlier_threshold
+        # WAD-scaled copy of the threshold so the validity scan compares
+        # plain ints instead of mixing int deviations with Decimal
+        self._outlier_scaled = int(outlier_threshold * _WAD)
+        self.current_timestamp = int(time.time())
+
+    def add_publisher(self, publisher: str):
+        """Add a valid price publisher"""
+        if publisher in self.active_publishers:
+            raise ValueError("Already a publisher")
+
+        self.active_publishers.add(publisher)
+
+        pid = self.publisher_id.get(publisher)
+        if pid is None:
+            self.publisher_id[publisher] = len(self._publisher_valid)
+            self._publisher_valid.append(True)
+            for prices in self._latest_price.values():
+                prices.append(0)
+            for timestamps in self._latest_ts.values():
+                timestamps.append(-1)
+        else:
+            self._publisher_valid[pid] = True
+
+    def remove_publisher(self, publisher: str):
+        """Remove a price publisher"""
+        if publisher not in self.active_publishers:
+            raise ValueError("Not a publisher")
+
+        self.active_publishers.discard(publisher)
+        self._publisher_valid[self.publisher_id[publisher]] = False
+
+    def set_fallback_oracle(self, fallback_oracle):
+        """Set fallback oracle"""
+        self.fallback_oracle = fallback_oracle
+
+    def set_staleness_threshold(self, threshold: int):
+        """Set staleness threshold"""
+        self.staleness_threshold = threshold
+
+    def set_outlier_threshold(self, threshold: Decimal):
+        """Set outlier threshold"""
+        self.outlier_threshold = threshold
+        self._outlier_scaled = int(threshold * _WAD)
+
+    def publish_price(self, token: str, publisher: str, price: int):
+        """Publish a price feed"""
+        if self.is_emergency_shutdown:
+            raise RuntimeError("Oracle shutdown")
+        
+        if publisher not in self.active_publishers:
+            raise PermissionError("Not a valid publisher")
+        
+        if price <= 0:
+            raise ValueError("Price must be positive")
+        
+        # Initialize token structure if needed
+        if token not in self.price_feeds:
+            self.price_feeds[token] = {}
+
+        # Overwrite the latest feed slot; prices stay Python ints (wei)
+        # end to end, matching the contract's uint256 and avoiding
+        # per-op Decimal allocation in the hot paths
+        price = int(price)
+        self.price_feeds[token][publisher] = PriceFeed(
+            price=price,
+            timestamp=self.current_timestamp,
+            is_valid=True
+        )
+
+        # Update last valid price
+        self.last_valid_price[token] = price
+
+        # Mirror the latest feed into the per-token SoA columns
+        pid = self.publisher_id[publisher]
+        if token not in self._latest_price:
+            publisher_count = len(self._publisher_valid)
+            self._latest_price[token] = [0] * publisher_count
+            self._latest_ts[token] = [-1] * publisher_count
+        self._latest_price[token][pid] = price
+        self._latest_ts[token][pid] = self.current_timestamp
+
+        # Add to TWAP history
+        if token not in self.twap_timestamps:
+            self.twap_timestamps[token] = []
+            self.twap_prices[token] = []
+            self.twap_cumsum[token] = []
+            self._twap_evicted_sum[token] = 0
+            self._twap_head[token] = 0
+
+        self.twap_timestamps[token].append(self.current_timestamp)
+        self.twap_prices[token].append(price)
+        cumsum = self.twap_cumsum[token]
+        cumsum.append((cumsum[-1] if cumsum else self._twap_evicted_sum[token]) + price)
+
+        # Clean up old TWAP data, at most once per staleness window
+        if self.current_timestamp >= self._next_cleanup_ts.get(token, 0):
+            self._cleanup_twap_history(token)
+            self._next_cleanup_ts[token] = self.current_timestamp + self.staleness_threshold
+
+    def get_price(self, token: str) -> Tuple[Decimal, int]:
+        """Get the current price for a token"""
+        if self.is_emergency_shutdown:
+            raise RuntimeError("Oracle shutdown")
+        
+        # Try to get median price from active publishers
+        prices = self._get_valid_prices(token)
+        
+        if not prices:
+            # No valid prices, try fallback oracle
+            if self.fallback_oracle is not None:
+                try:
+                    return self.fallback_oracle.get_price(token)
+                except Exception:
+                    raise RuntimeError("No valid price available")
+            raise RuntimeError("No valid price available")
+        
+        # Calculate median price; single Decimal cast at the API boundary
+        price = self._calculate_median(prices)
+        timestamp = self.current_timestamp
+
+        return (Decimal(price), timestamp)
+
+    def get_prices_batch(self, tokens) -> List[Optional[Decimal]]:
+        """Median prices for many tokens in one pass
+
+        Fuzz harnesses query every token per tick; this amortizes the
+        shutdown check and method dispatch across the batch and yields
+        None for tokens without a valid price instead of raising
+        per token (the fallback oracle is not consulted here).
+        """
+        if self.is_emergency_shutdown:
+            raise RuntimeError("Oracle shutdown")
+
+        get_valid_prices = self._get_valid_prices
+        calculate_median = self._calculate_median
+
+        results = []
+        append = results.append
+        for token in tokens:
+            prices = get_valid_prices(token)
+            append(Decimal(calculate_median(prices)) if prices else None)
+        return results
+
+    def get_twap_price(self, token: str, window: int) -> Tuple[Decimal, int]:
+        """Get the TWAP price for a token"""
+        if self.is_emergency_shutdown:
+            raise RuntimeError("Oracle shutdown")
+        
+        timestamps = self.twap_timestamps.get(token)
+        head = self._twap_head.get(token, 0)
+        if timestamps is None or head >= len(timestamps):
+            raise ValueError("No TWAP history")
+
+        end_time = self.current_timestamp
+        start_time = end_time - window
+
+        # Timestamps are sorted, so binary-search the window start
+        # within the live region; when every point predates the window,
+        # fall back to the full live history like the original scan did
+        start_index = bisect_left(timestamps, start_time, head)
+        if start_index == len(timestamps):
+            start_index = head
+
+        # Windowed sum from the prefix array: two lookups and a subtract
+        # Prefix values before the head stay in place until compaction,
+        # so any start_index >= head subtracts the right base
+        cumsum = self.twap_cumsum[token]
+        base = cumsum[start_index - 1] if start_index > 0 else self._twap_evicted_sum[token]
+        sum_price = cumsum[-1] - base
+        count = len(cumsum) - start_index
+
+        if count == 0:
+            raise ValueError("No data points in window")
+
+        price = Decimal(sum_price) / count
+        timestamp = end_time
+        
+        return (price, timestamp)
+
+    def emergency_shutdown(self):
+        """Emergency shutdown of the oracle"""
+        self.is_emergency_shutdown = True
+
+    def resume_operations(self):
+        """Resume oracle operations after emergency shutdown"""
+        self.is_emergency_shutdown = False
+
+    def _get_valid_prices(self, token: str, apply_outlier: bool = True) -> List[int]:
+        """Get valid prices from active publishers
+
+        Walks the per-token SoA columns with everything bound to locals;
+        a -1 timestamp marks a publisher that never fed this token.
+        Quorum counting passes apply_outlier=False to keep its original
+        staleness-only semantics.
+        """
+        latest_prices = self._latest_price.get(token)
+        if latest_prices is None:
+            return []
+
+        latest_ts = self._latest_ts[token]
+        publisher_valid = self._publisher_valid
+        now = self.current_timestamp
+        staleness = self.staleness_threshold
+        last_price = self.last_valid_price.get(token, 0) if apply_outlier else 0
+        threshold = self._outlier_scaled
+
+        valid_prices = []
+        for pid, ts in enumerate(latest_ts):
+            if ts < 0 or not publisher_valid[pid]:
+                continue
+
+            # Check for staleness
+            if now - ts > staleness:
+                continue
+
+            # Check for outliers
+            price = latest_prices[pid]
+            if last_price > 0:
+                if abs(price - last_price) * _WAD // last_price > threshold:
+                    continue
+
+            valid_prices.append(price)
+
+        return valid_prices
+
+    def _calculate_median(self, array: List[int]) -> int:
+        """Calculate median of an integer array"""
+        if not array:
+            raise ValueError("Empty array")
+
+        # Quickselect the middle element instead of sorting the whole
+        # array; one copy keeps the caller's list untouched
+        values = list(array)
+        length = len(values)
+        mid = length // 2
+
+        upper = _quickselect(values, mid)
+        if length % 2:
+            return upper
+
+        # Even case: the partition left of mid holds everything below
+        # the upper middle, so its max is the lower middle element
+        return (max(values[:mid]) + upper) // 2
+
+    def _calculate_deviation(self, price1: int, price2: int) -> int:
+        """Calculate deviation between two prices as a 1e18-scaled int"""
+        if price2 == 0:
+            return 0
+
+        return abs(price1 - price2) * _WAD // price2
+
+    def _cleanup_twap_history(self, token: str):
+        """Clean up old TWAP history data"""
+        timestamps = self.twap_timestamps.get(token)
+        if not timestamps:
+            return
+
+        cutoff_time = self.current_timestamp - (self.staleness_threshold * 2)
+
+        # Advance the logical head past expired entries; physically
+        # compact only when most of the storage is dead
+        head = bisect_left(timestamps, cutoff_time, self._twap_head.get(token, 0))
+        self._twap_head[token] = head
+        if head > len(timestamps) // 2:
+            if head:
+                self._twap_evicted_sum[token] = self.twap_cumsum[token][head - 1]
+            del timestamps[:head]
+            del self.twap_prices[token][:head]
+            del self.twap_cumsum[token][:head]
+            self._twap_head[token] = 0
+
+    def get_publisher_count(self) -> int:
+        """Get number of active publishers"""
+        return len(self.active_publishers)
+
+    def is_quorum_met(self, token: str) -> bool:
+        """Check if quorum is met (at least 2 publishers)"""
+        return len(self._get_valid_prices(token, apply_outlier=False)) >= 2
+
+    def advance_time(self, seconds: int):
+        """Advance the current timestamp for testing"""
+        self.current_timestamp += seconds
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    # Create oracle reference model
+    oracle = OracleReferenceModel(staleness_threshold=600, outlier_threshold=Decimal('0.05'))
+    
+    # Add publishers
+    oracle.add_publisher("publisher1")
+    oracle.add_publisher("publisher2")
+    oracle.add_publisher("publisher3")
+    
+    # Publish prices
+    oracle.publish_price("ETH", "publisher1", 1000 * 10**18)  # $1000
+    oracle.publish_price("ETH", "publisher2", 1050 * 10**18)  # $1050
+    oracle.publish_price("ETH", "publisher3", 950 * 10**18)   # $950
+    
+    # Get median price
+    price, timestamp = oracle.get_price("ETH")
+    print(f"Median price: {price}")
+    
+    # Advance time and publish more prices for TWAP
+    oracle.advance_time(600)  # Advance 10 minutes
+    oracle.publish_price("ETH", "publisher1", 1100 * 10**18)  # $1100
+    
+    oracle.advance_time(600)  # Advance 10 minutes
+    oracle.publish_price("ETH", "publisher1", 900 * 10**18)   # $900
+    
+    # Get TWAP price
+    twap_price, twap_timestamp = oracle.get_twap_price("ETH", 1800)  # 30-minute window
+    print(f"TWAP price: {twap_price}")
+    
+    # Check quorum
     print(f"Quorum met: {oracle.is_quorum_met('ETH')}")
\ No newline at end of file